@@ -7,32 +7,54 @@ import os
 import re
 import sys
 import array
+import bisect
 import pickle
 import random
 import operator
 import unittest
 import functools
+import itertools
 from typing import TYPE_CHECKING
 from collections.abc import Set, Callable, Iterable, Iterator
 
 import hypothesis.strategies as st
-from hypothesis import given, assume, errors, settings, Verbosity, HealthCheck
+from hypothesis import (
+    given,
+    Phase,
+    assume,
+    errors,
+    settings,
+    Verbosity,
+    HealthCheck,
+)
 
 import pyroaring
 from pyroaring import BitMap, FrozenBitMap, AbstractBitMap
 
 
+# The explain and target phases only add work here: no test calls target() and
+# failures are plain equality assertions.
+phases = [Phase.explicit, Phase.reuse, Phase.generate, Phase.shrink]
 settings.register_profile("ci", settings(
-    max_examples=100, deadline=None))
-settings.register_profile("dev", settings(max_examples=10, deadline=None))
+    max_examples=100, deadline=None, phases=phases))
+settings.register_profile("dev", settings(max_examples=10, deadline=None, phases=phases))
 settings.register_profile("debug", settings(
-    max_examples=10, verbosity=Verbosity.verbose, deadline=None))
+    max_examples=10, verbosity=Verbosity.verbose, deadline=None, phases=phases))
 try:
     env = os.getenv('HYPOTHESIS_PROFILE', 'dev')
     settings.load_profile(env)
 except errors.InvalidArgument:
     sys.exit('Unknown hypothesis profile: %s.' % env)
 
+
+def scaled_examples(factor: float, min_examples: int = 10) -> int:
+    # Spend the example budget of the loaded profile where it pays off: more examples for
+    # cheap tests, fewer for the tests that build many or large bitmaps per example.
+    # Scaling down never goes below a few meaningful examples (or the profile budget, if lower).
+    max_examples: int = settings().max_examples
+    return max(min(max_examples, min_examples), int(max_examples * factor))
+
+
 uint18 = st.integers(min_value=0, max_value=2**18)
 uint32 = st.integers(min_value=0, max_value=2**32 - 1)
 uint64 = st.integers(min_value=0, max_value=2**64 - 1)
@@ -40,38 +62,56 @@ large_uint64 = st.integers(min_value=2**32, max_value=2**64 - 1)
 integer = st.integers(min_value=0, max_value=2**31 - 1)
 int64 = st.integers(min_value=-2**63, max_value=2**63 - 1)
 
-range_max_size = 2**18
-
-range_big_step = uint18.flatmap(lambda n:
-                                st.builds(range, st.just(n),
-                                          st.integers(
-                                              min_value=n + 1, max_value=n + range_max_size),
-                                          st.integers(min_value=2**8, max_value=range_max_size // 8)))
-
-range_small_step = uint18.flatmap(lambda n:
-                                  st.builds(range, st.just(n),
-                                            st.integers(
-                                                min_value=n + 1, max_value=n + range_max_size),
-                                            st.integers(min_value=1, max_value=2**8)))
-
-range_power2_step = uint18.flatmap(lambda n:
-                                   st.builds(range, st.just(n),
-                                             st.integers(
-                                                 min_value=n + 1, max_value=n + range_max_size),
-                                             st.integers(min_value=0, max_value=8).flatmap(
-                                       lambda n: st.just(2**n),
-                                   )))
-
-hyp_range = range_big_step | range_small_step | range_power2_step | st.sampled_from(
+# Ranges may span several containers (2**16 values each), but the number of values they hold
+# is capped by raising the step of the longest ones.
+range_max_span = 2**18
+range_max_size = 2**14
+
+range_step = (
+    st.integers(min_value=2**8, max_value=range_max_span // 8)  # big step
+    | st.integers(min_value=1, max_value=2**8)  # small step
+    | st.integers(min_value=0, max_value=8).map(lambda n: 2**n)  # power of 2 step
+)
+
+
+@st.composite
+def non_empty_range(draw: st.DrawFn) -> range:
+    start = draw(uint18)
+    stop = draw(st.integers(min_value=start + 1, max_value=start + range_max_span))
+    step = draw(range_step)
+    min_step = -(-(stop - start) // range_max_size)  # ceiling division
+    return range(start, stop, max(step, min_step))
+
+
+hyp_range = non_empty_range() | st.sampled_from(
     [range(0, 0)])  # last one is an empty range
 # would be great to build a true random set, but it takes too long and hypothesis does a timeout...
-hyp_set: st.SearchStrategy[set[int]] = st.builds(set, hyp_range)
+# Building a set from a drawn range is costly too, so sets are copied from a pool built once.
+hyp_set_pool = [
+    frozenset(range(start, start + length, step))
+    for start in [0, 2**10 + 3, 2**16 - 7, 2**18]
+    for length, step in [
+        (1, 1),
+        (100, 1),
+        (5000, 1),
+        (5000, 3),
+        (range_max_size, 1),
+        (range_max_span, 2**4),
+        (range_max_span, 23),
+        (range_max_span, 2**8 + 1),
+    ]
+] + [frozenset()]
+hyp_set: st.SearchStrategy[set[int]] = st.sampled_from(hyp_set_pool).map(set)
 hyp_array = st.builds(lambda x: array.array('I', x), hyp_range)
 hyp_collection = hyp_range | hyp_set | hyp_array
 hyp_many_collections = st.lists(hyp_collection, min_size=1, max_size=20)
 
 bitmap_cls = st.sampled_from([BitMap, FrozenBitMap])
 
+# True on almost every generated example, but shrinks towards False: this lets the shrinker
+# turn off expensive checks whenever they are not needed to reproduce a failure.
+usually = st.integers(min_value=0, max_value=99).map(lambda n: n > 0)
+
 if TYPE_CHECKING:
     from typing_extensions import TypeAlias
 
@@ -82,25 +122,36 @@ if TYPE_CHECKING:
 
 class Util:
 
-    comparison_set = random.sample(
-        range(2**8), 100) + random.sample(range(2**31 - 1), 50)
+    comparison_set = frozenset(random.sample(
+        range(2**8), 100) + random.sample(range(2**31 - 1), 50))
+    # bitmaps can only interact with bitmaps sharing the same copy_on_write setting
+    comparison_bm = {
+        False: BitMap(comparison_set, copy_on_write=False),
+        True: BitMap(comparison_set, copy_on_write=True),
+    }
 
-    def compare_with_set(self, bitmap: AbstractBitMap, expected_set: set[int]) -> None:
+    def compare_with_set(
+        self,
+        bitmap: AbstractBitMap,
+        expected_set: set[int],
+        full_check: bool = True,
+        expected_bm: AbstractBitMap | None = None,
+    ) -> None:
         assert len(bitmap) == len(expected_set)
+        if not full_check:
+            return
         assert bool(bitmap) == bool(expected_set)
-        assert set(bitmap) == expected_set
-        assert sorted(list(bitmap)) == sorted(list(expected_set))
-        assert BitMap(expected_set, copy_on_write=bitmap.copy_on_write) == bitmap
-        for value in self.comparison_set:
-            if value in expected_set:
-                assert value in bitmap
-            else:
-                assert value not in bitmap
+        if expected_bm is None:
+            expected_bm = BitMap(expected_set, copy_on_write=bitmap.copy_on_write)
+        assert expected_bm == bitmap
+        # the equality above runs container-wise in CRoaring, only spot-check iteration
+        assert next(iter(bitmap), None) == min(expected_set, default=None)
+        assert set(bitmap & self.comparison_bm[bitmap.copy_on_write]) == expected_set & self.comparison_set
 
     @staticmethod
-    def bitmap_sample(bitmap: AbstractBitMap, size: int) -> list[int]:
-        indices = random.sample(range(len(bitmap)), size)
-        return [bitmap[i] for i in indices]
+    def sorted_distinct(values: Iterable[int]) -> list[int]:
+        # bitmaps hold each value once, in increasing order
+        return sorted(set(values))
 
     def assert_is_not(self, bitmap1: AbstractBitMap, bitmap2: AbstractBitMap) -> None:
         if isinstance(bitmap1, BitMap):
@@ -122,40 +173,47 @@ class Util:
 
 class TestBasic(Util):
 
-    @given(hyp_collection, st.booleans())
-    @settings(deadline=None)
-    def test_basic(self, values: HypCollection, cow: bool) -> None:
+    @given(hyp_collection, st.booleans(), usually)
+    @settings(deadline=None, max_examples=scaled_examples(0.2))
+    def test_basic(self, values: HypCollection, cow: bool, full_check: bool) -> None:
         bitmap = BitMap(copy_on_write=cow)
         assert bitmap.copy_on_write == cow
         expected_set: set[int] = set()
-        self.compare_with_set(bitmap, expected_set)
+        # maintained alongside expected_set with the bulk methods, rather than rebuilt for each comparison
+        expected_bm = BitMap(copy_on_write=cow)
+        self.compare_with_set(bitmap, expected_set, full_check, expected_bm)
         values = list(values)
         random.shuffle(values)
         size = len(values)
         for value in values[:size // 2]:
             bitmap.add(value)
             expected_set.add(value)
-        self.compare_with_set(bitmap, expected_set)
+        expected_bm.update(values[:size // 2])
+        self.compare_with_set(bitmap, expected_set, full_check, expected_bm)
         for value in values[size // 2:]:
             bitmap.add(value)
             with pytest.raises(KeyError):
                 bitmap.add_checked(value)
             expected_set.add(value)
-        self.compare_with_set(bitmap, expected_set)
+        expected_bm.update(values[size // 2:])
+        self.compare_with_set(bitmap, expected_set, full_check, expected_bm)
         for value in values[:size // 2]:
             bitmap.remove(value)
             expected_set.remove(value)
             with pytest.raises(KeyError):
                 bitmap.remove(value)
-        self.compare_with_set(bitmap, expected_set)
+        expected_bm.difference_update(BitMap(values[:size // 2], copy_on_write=cow))
+        self.compare_with_set(bitmap, expected_set, full_check, expected_bm)
         for value in values[size // 2:]:
             bitmap.discard(value)
             # check that we can discard element not in the bitmap
             bitmap.discard(value)
             expected_set.discard(value)
-        self.compare_with_set(bitmap, expected_set)
+        expected_bm.difference_update(BitMap(values[size // 2:], copy_on_write=cow))
+        self.compare_with_set(bitmap, expected_set, full_check, expected_bm)
 
     @given(bitmap_cls, bitmap_cls, hyp_collection, st.booleans())
+    @settings(max_examples=scaled_examples(1.5))
     def test_bitmap_equality(
         self,
         cls1: type[EitherBitMap],
@@ -181,16 +239,37 @@ class TestBasic(Util):
         bitmap2 = cls2(values2, copy_on_write=cow)
         assert bitmap1 != bitmap2
 
-    @given(bitmap_cls, hyp_collection, st.booleans())
+    @given(bitmap_cls, hyp_collection, st.booleans(), usually)
+    @settings(max_examples=scaled_examples(1.5))
     def test_constructor_values(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
         cow: bool,
+        full_check: bool,
+    ) -> None:
+        bitmap = cls(values, copy_on_write=cow)
+        expected_set = set(values)
+        self.compare_with_set(bitmap, expected_set, full_check)
+        # compare_with_set only spot-checks iteration, check it in full here
+        assert list(bitmap) == self.sorted_distinct(values)
+
+    @given(bitmap_cls, hyp_collection, st.lists(uint32, max_size=50), st.booleans())
+    def test_contains(
+        self,
+        cls: type[EitherBitMap],
+        values: HypCollection,
+        other_values: list[int],
+        cow: bool,
     ) -> None:
         bitmap = cls(values, copy_on_write=cow)
         expected_set = set(values)
-        self.compare_with_set(bitmap, expected_set)
+        # probe some values known to be present along with arbitrary ones
+        for value in self.comparison_set.union(other_values, itertools.islice(values, 50)):
+            if value in expected_set:
+                assert value in bitmap
+            else:
+                assert value not in bitmap
 
     @given(bitmap_cls, bitmap_cls, hyp_collection, uint32, st.booleans(), st.booleans())
     def test_constructor_copy(
@@ -256,7 +335,7 @@ class TestBasic(Util):
     ) -> None:
         bitmap = cls(values, copy_on_write=cow)
         result = bitmap.to_array()
-        expected = array.array('I', sorted(values))
+        expected = array.array('I', self.sorted_distinct(values))
         assert result == expected
 
     @given(bitmap_cls, st.booleans(), st.integers(min_value=0, max_value=100))
@@ -274,27 +353,25 @@ def slice_arg(n: int) -> st.SearchStrategy[int]:
 
 class TestSelectRank(Util):
 
-    @given(bitmap_cls, hyp_collection, st.booleans())
+    @given(bitmap_cls, hyp_collection)
     def test_simple_select(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
-        cow: bool,
     ) -> None:
-        bitmap = cls(values, copy_on_write=cow)
-        values = list(bitmap)  # enforce sorted order
-        for i in range(-len(values), len(values)):
-            assert bitmap[i] == values[i]
+        bitmap = cls(values)
+        array_values = bitmap.to_array()  # sorted, and copied without boxing each value
+        for i in range(-len(array_values), len(array_values)):
+            assert bitmap[i] == array_values[i]
 
-    @given(bitmap_cls, hyp_collection, uint32, st.booleans())
+    @given(bitmap_cls, hyp_collection, uint32)
     def test_wrong_selection(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
         n: int,
-        cow: bool,
     ) -> None:
-        bitmap = cls(values, cow)
+        bitmap = cls(values)
         with pytest.raises(IndexError):
             bitmap[len(values)]
         with pytest.raises(IndexError):
@@ -314,13 +391,13 @@ class TestSelectRank(Util):
         cow: bool,
     ) -> None:
         bitmap = cls(values, copy_on_write=cow)
-        values = list(bitmap)  # enforce sorted order
-        expected = values[start:stop:step]
+        expected = self.sorted_distinct(values)[start:stop:step]
         expected.sort()
-        observed = list(bitmap[start:stop:step])
-        assert expected == observed
+        observed = bitmap[start:stop:step].to_array()
+        assert array.array('I', expected) == observed
 
     @given(bitmap_cls, hyp_collection, slice_arg(2**12), slice_arg(2**12), slice_arg(2**5), st.booleans())
+    @settings(max_examples=scaled_examples(0.5))
     def test_slice_select_non_empty(
         self,
         cls: type[EitherBitMap],
@@ -335,6 +412,7 @@ class TestSelectRank(Util):
         self.check_slice(cls, values, start, stop, step, cow)
 
     @given(bitmap_cls, hyp_collection, slice_arg(2**12), slice_arg(2**12), slice_arg(2**5), st.booleans())
+    @settings(max_examples=scaled_examples(0.5))
     def test_slice_select_empty(
         self,
         cls: type[EitherBitMap],
@@ -349,6 +427,7 @@ class TestSelectRank(Util):
         self.check_slice(cls, values, start, stop, step, cow)
 
     @given(bitmap_cls, hyp_collection, slice_arg(2**12) | st.none(), slice_arg(2**12) | st.none(), slice_arg(2**5) | st.none(), st.booleans())
+    @settings(max_examples=scaled_examples(0.5))
     def test_slice_select_none(
         self,
         cls: type[EitherBitMap],
@@ -361,39 +440,36 @@ class TestSelectRank(Util):
         assume(step != 0)
         self.check_slice(cls, values, start, stop, step, cow)
 
-    @given(bitmap_cls, hyp_collection, st.booleans())
+    @given(bitmap_cls, hyp_collection)
     def test_simple_rank(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
-        cow: bool,
     ) -> None:
-        bitmap = cls(values, copy_on_write=cow)
-        for i, value in enumerate(sorted(values)):
+        bitmap = cls(values)
+        for i, value in enumerate(self.sorted_distinct(values)):
             assert bitmap.rank(value) == i + 1
 
-    @given(bitmap_cls, hyp_collection, uint18, st.booleans())
+    @given(bitmap_cls, hyp_collection, uint18)
     def test_general_rank(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
         element: int,
-        cow: bool,
     ) -> None:
-        bitmap = cls(values, copy_on_write=cow)
+        bitmap = cls(values)
         observed_rank = bitmap.rank(element)
-        expected_rank = len([n for n in set(values) if n <= element])
+        expected_rank = bisect.bisect_right(self.sorted_distinct(values), element)
         assert expected_rank == observed_rank
 
-    @given(bitmap_cls, hyp_collection, st.booleans())
+    @given(bitmap_cls, hyp_collection)
     def test_min(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
-        cow: bool,
     ) -> None:
         assume(len(values) > 0)
-        bitmap = cls(values, copy_on_write=cow)
+        bitmap = cls(values)
         assert bitmap.min() == min(values)
 
     @given(bitmap_cls)
@@ -402,15 +478,14 @@ class TestSelectRank(Util):
         with pytest.raises(ValueError):
             bitmap.min()
 
-    @given(bitmap_cls, hyp_collection, st.booleans())
+    @given(bitmap_cls, hyp_collection)
     def test_max(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
-        cow: bool,
     ) -> None:
         assume(len(values) > 0)
-        bitmap = cls(values, copy_on_write=cow)
+        bitmap = cls(values)
         assert bitmap.max() == max(values)
 
     @given(bitmap_cls)
@@ -430,7 +505,7 @@ class TestSelectRank(Util):
         assume(len(values) > 0)
         bitmap = cls(values, copy_on_write=cow)
         try:
-            expected = next(i for i in sorted(values) if i >= other_value)
+            expected = next(i for i in self.sorted_distinct(values) if i >= other_value)
             assert bitmap.next_set_bit(other_value) == expected
         except StopIteration:
             with pytest.raises(ValueError):
@@ -456,13 +531,14 @@ class TestBinaryOperations(Util):
         values2: HypCollection,
         cow: bool,
     ) -> None:
+        # the operators must not modify their operands, so these are built only once
+        self.set1 = set(values1)
+        self.set2 = set(values2)
+        self.bitmap1 = cls1(values1, cow)
+        self.bitmap2 = cls2(values2, cow)
+        old_bitmap1 = cls1(self.bitmap1)
+        old_bitmap2 = cls2(self.bitmap2)
         for op in [operator.or_, operator.and_, operator.xor, operator.sub]:
-            self.set1 = set(values1)
-            self.set2 = set(values2)
-            self.bitmap1 = cls1(values1, cow)
-            self.bitmap2 = cls2(values2, cow)
-            old_bitmap1 = cls1(self.bitmap1)
-            old_bitmap2 = cls2(self.bitmap2)
             result_set = op(self.set1, self.set2)
             result_bitmap = op(self.bitmap1, self.bitmap2)
             assert self.bitmap1 == old_bitmap1
@@ -543,11 +619,11 @@ class TestComparison(Util):
         values2: HypCollection,
         cow: bool,
     ) -> None:
+        self.set1 = set(values1)
+        self.set2 = set(values2)
+        self.bitmap1 = cls1(values1, copy_on_write=cow)
+        self.bitmap2 = cls2(values2, copy_on_write=cow)
         for op in [operator.le, operator.ge, operator.lt, operator.gt, operator.eq, operator.ne]:
-            self.set1 = set(values1)
-            self.set2 = set(values2)
-            self.bitmap1 = cls1(values1, copy_on_write=cow)
-            self.bitmap2 = cls2(values2, copy_on_write=cow)
             assert op(self.bitmap1, self.bitmap1) == \
                              op(self.set1, self.set1)
             assert op(self.bitmap1, self.bitmap2) == \
@@ -679,15 +755,14 @@ class TestCardinality(Util):
         values2: HypCollection,
         cow: bool,
     ) -> None:
-
+        self.bitmap1 = cls1(values1, copy_on_write=cow)
+        self.bitmap2 = cls2(values2, copy_on_write=cow)
         for real_op, estimated_op in [
             (operator.or_, cls1.union_cardinality),
             (operator.and_, cls1.intersection_cardinality),
             (operator.sub, cls1.difference_cardinality),
             (operator.xor, cls1.symmetric_difference_cardinality),
         ]:
-            self.bitmap1 = cls1(values1, copy_on_write=cow)
-            self.bitmap2 = cls2(values2, copy_on_write=cow)
             real_value = len(real_op(self.bitmap1, self.bitmap2))
             estimated_value = estimated_op(self.bitmap1, self.bitmap2)
             assert real_value == estimated_value
@@ -730,6 +805,7 @@ class TestManyOperations(Util):
     all_bitmaps: Iterable[AbstractBitMap]
 
     @given(hyp_collection, hyp_many_collections, st.booleans())
+    @settings(max_examples=scaled_examples(0.15))
     def test_update(
         self,
         initial_values: HypCollection,
@@ -746,6 +822,7 @@ class TestManyOperations(Util):
         assert type(expected_result) == type(self.initial_bitmap)
 
     @given(hyp_collection, hyp_many_collections, st.booleans())
+    @settings(max_examples=scaled_examples(0.15))
     def test_intersection_update(
         self,
         initial_values: HypCollection,
@@ -762,6 +839,7 @@ class TestManyOperations(Util):
         assert type(expected_result) == type(self.initial_bitmap)
 
     @given(bitmap_cls, st.data(), hyp_many_collections, st.booleans())
+    @settings(max_examples=scaled_examples(0.15))
     def test_union(
         self,
         cls: type[EitherBitMap],
@@ -773,11 +851,13 @@ class TestManyOperations(Util):
         self.all_bitmaps = [classes[i](values, copy_on_write=cow)
                             for i, values in enumerate(all_values)]
         result = cls.union(*self.all_bitmaps)
-        expected_result = functools.reduce(
-            lambda x, y: x | y, self.all_bitmaps)
+        expected_result = BitMap(self.all_bitmaps[0], copy_on_write=cow)
+        for bitmap in self.all_bitmaps[1:]:
+            expected_result |= bitmap
         assert expected_result == result
 
     @given(bitmap_cls, st.data(), hyp_many_collections, st.booleans())
+    @settings(max_examples=scaled_examples(0.15))
     def test_intersection(
         self,
         cls: type[EitherBitMap],
@@ -789,11 +869,13 @@ class TestManyOperations(Util):
         self.all_bitmaps = [classes[i](values, copy_on_write=cow)
                             for i, values in enumerate(all_values)]
         result = cls.intersection(*self.all_bitmaps)
-        expected_result = functools.reduce(
-            lambda x, y: x & y, self.all_bitmaps)
+        expected_result = BitMap(self.all_bitmaps[0], copy_on_write=cow)
+        for bitmap in self.all_bitmaps[1:]:
+            expected_result &= bitmap
         assert expected_result == result
 
     @given(bitmap_cls, st.data(), hyp_many_collections, st.booleans())
+    @settings(max_examples=scaled_examples(0.15))
     def test_difference(
         self,
         cls: type[EitherBitMap],
@@ -805,8 +887,9 @@ class TestManyOperations(Util):
         self.all_bitmaps = [classes[i](values, copy_on_write=cow)
                             for i, values in enumerate(all_values)]
         result = cls.difference(*self.all_bitmaps)
-        expected_result = functools.reduce(
-            lambda x, y: x - y, self.all_bitmaps)
+        expected_result = BitMap(self.all_bitmaps[0], copy_on_write=cow)
+        for bitmap in self.all_bitmaps[1:]:
+            expected_result -= bitmap
         assert expected_result == result
 
 
@@ -823,6 +906,8 @@ class TestSerialization(Util):
         buff = old_bm.serialize()
         new_bm = cls2.deserialize(buff)
         assert old_bm == new_bm
+        # the portable format is deterministic, so a faithful round trip gives the same bytes
+        assert new_bm.serialize() == buff
         assert isinstance(new_bm, cls2)
         self.assert_is_not(old_bm, new_bm)
 
@@ -842,14 +927,13 @@ class TestSerialization(Util):
 
 class TestStatistics(Util):
 
-    @given(bitmap_cls, hyp_collection, st.booleans())
+    @given(bitmap_cls, hyp_collection)
     def test_basic_properties(
         self,
         cls: type[EitherBitMap],
         values: HypCollection,
-        cow: bool,
     ) -> None:
-        bitmap = cls(values, copy_on_write=cow)
+        bitmap = cls(values)
         stats = bitmap.get_statistics()
         assert stats['n_values_array_containers'] + stats['n_values_bitset_containers'] \
                          + stats['n_values_run_containers'] == len(bitmap)
@@ -857,11 +941,12 @@ class TestStatistics(Util):
                          2 * stats['n_values_array_containers']
         assert stats['n_bytes_bitset_containers'] == \
                          2**13 * stats['n_bitset_containers']
-        if len(values) > 0:
-            assert stats['min_value'] == bitmap[0]
-            assert stats['max_value'] == bitmap[len(bitmap) - 1]
+        distinct_values = self.sorted_distinct(values)  # the statistics are computed over distinct values
+        if distinct_values:
+            assert stats['min_value'] == distinct_values[0]
+            assert stats['max_value'] == distinct_values[-1]
         assert stats['cardinality'] == len(bitmap)
-        assert stats['sum_value'] == sum(values)
+        assert stats['sum_value'] == sum(distinct_values)
 
     @given(bitmap_cls)
     def test_implementation_properties_array(self, cls: type[EitherBitMap]) -> None:
@@ -901,22 +986,9 @@ class TestStatistics(Util):
 class TestFlip(Util):
 
     def check_flip(self, bm_before: AbstractBitMap, bm_after: AbstractBitMap, start: int, end: int) -> None:
-        size = 100
-        iter_range = random.sample(
-            range(start, end), min(size, len(range(start, end))))
-        iter_before = self.bitmap_sample(bm_before, min(size, len(bm_before)))
-        iter_after = self.bitmap_sample(bm_after, min(size, len(bm_after)))
-        for elt in iter_range:
-            if elt in bm_before:
-                assert elt not in bm_after
-            else:
-                assert elt in bm_after
-        for elt in iter_before:
-            if not (start <= elt < end):
-                assert elt in bm_after
-        for elt in iter_after:
-            if not (start <= elt < end):
-                assert elt in bm_before
+        # flipping a range is the symmetric difference with that range
+        flipped_range = BitMap(range(start, end), copy_on_write=bm_before.copy_on_write)
+        assert bm_after == bm_before ^ flipped_range
 
     @given(bitmap_cls, hyp_collection, integer, integer, st.booleans())
     def test_flip_empty(